@@ -21,31 +21,30 @@ Functions:
 
 Exceptions:
 - RankError: Custom exception for rank-related errors in DIMM processing.
+
+Requirements:
+- pyserial: only for the USB modes (--usb-info and --flash-mcu-dfu).
+- pandas: only to print the table of USB devices (--usb-info, also printed by --flash-mcu-dfu).
+- dfu-util: only for the --flash-mcu-dfu mode.
 """
 
 from __future__ import annotations
 
 import argparse
 import glob
+import io
 import os
 import re
+import shlex
 import subprocess
 import sys
+import threading
 import time
 from argparse import Namespace
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import (Callable, Dict, Iterable, List, NamedTuple,
                     Optional, TypeVar, Union, cast)
 
-try:
-    import pandas as pd
-except ImportError as imp_err:
-    raise ImportError("pandas is not installed. Please install it with you system package manager "
-                      "(e.g. apt install python3-pandas).") from imp_err
-try:
-    import serial
-except ImportError as imp_err:
-    raise ImportError("pyserial is not installed. Please install it with you system package "
-                      "manager (e.g. apt install python3-serial).") from imp_err
 from dpu.vpd import vpd
 from dpu.vpd.db import DPUVpdDatabase
 from dpu.vpd.dimm import DPUVpd
@@ -55,8 +54,60 @@ class RankError(Exception):
     """Exception raised for errors in processing ranks."""
 
 
+# pandas and pyserial are slow to import, so they are imported on first use: pyserial by the USB
+# modes, pandas only to print the table of USB devices.
+def import_pandas():
+    try:
+        import pandas
+    except ImportError as imp_err:
+        raise ImportError("pandas is not installed. Please install it with you system package "
+                          "manager (e.g. apt install python3-pandas).") from imp_err
+    return pandas
+
+
+def import_serial():
+    try:
+        import serial
+    except ImportError as imp_err:
+        raise ImportError("pyserial is not installed. Please install it with you system package "
+                          "manager (e.g. apt install python3-serial).") from imp_err
+    return serial
+
+
 RankOperation = Callable[[Namespace, str], None]
-GlobalOperation = Callable[[Namespace, List[str]], None]
+GlobalOperation = Callable[[Namespace, Iterable[str]], None]
+
+# Console answer of an upmem tty device to 'dimm', e.g.: DIMM 'dpu_rank0' 'dpu_rank1' S/N 12634275
+_SN_RE = re.compile(rb'S/N (\w+)\r\n')
+_RANK_RE = re.compile(rb"'(dpu_rank\d+)'")
+_RANK_PATH_RE = re.compile(r"dpu_rank\d{1,2}$")
+_DFU_RE = re.compile(r'Found DFU: \[0483:df11\].*?path="(.*?)"', re.MULTILINE)
+
+# Serialize output of concurrent rank operations so that lines do not interleave.
+print_lock = threading.RLock()
+
+
+class ThreadOutput(io.TextIOBase):
+    """sys.stdout replacement giving each worker thread its own output buffer.
+
+    Threads without a buffer (e.g. the main thread) write to the wrapped stream.
+    """
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            with print_lock:
+                return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
 
 
 def rank_operation(func: RankOperation) -> RankOperation:
@@ -69,6 +120,28 @@ def global_operation(func: GlobalOperation) -> GlobalOperation:
     return func
 
 
+def parse_dpu_ids(dpu_list: Optional[List[str]]) -> List[tuple[int, int]]:
+    """Parse the <x.y> values of --disable-dpu and --enable-dpu options.
+
+    Args:
+        dpu_list (list of str): Values given on the command line, may be None.
+
+    Returns:
+        list of tuple: (slice_id, dpu_id) pairs.
+
+    Raises:
+        ValueError: If a value is not in the form x.y.
+    """
+    dpu_ids = []
+    for dpu in dpu_list or ():
+        slice_id, _, dpu_id = dpu.partition('.')
+        try:
+            dpu_ids.append((int(slice_id), int(dpu_id)))
+        except ValueError as e:
+            raise ValueError(f"Invalid DPU {dpu}, it must be in the form x.y") from e
+    return dpu_ids
+
+
 def validate_args(args: Namespace) -> None:
     """Validate the command-line arguments.
 
@@ -90,71 +163,207 @@ def validate_args(args: Namespace) -> None:
     if (args.disable_dpu or args.enable_dpu) and not args.rank:
         raise ValueError("You must specify at least a rank with --rank option.")
 
-    if args.update_db and not all('=' in pair for pair in args.update_db):
-        raise ValueError("--update-db option must be in the form key=value.")
+    # Parsed once here instead of for each rank by vpd_mode()
+    args.disable_dpu_ids = parse_dpu_ids(args.disable_dpu)
+    args.enable_dpu_ids = parse_dpu_ids(args.enable_dpu)
 
-    if args.update_db and not all(len(pair.split('=')) == 2 for pair in args.update_db):
-        raise ValueError("--update-db option must be in the form key=value.")
+    for pair in args.update_db or ():
+        key, separator, value = pair.partition('=')
+        if not key or not separator or '=' in value:
+            raise ValueError("--update-db option must be in the form key=value.")
 
-    if args.set_vdd and (int(args.set_vdd) < 1000 or int(args.set_vdd) >= 1600):
+    if args.jobs < 1:
+        raise ValueError("--jobs value must be at least 1.")
+
+    if args.dfu_timeout <= 0:
+        raise ValueError("--dfu-timeout value must be positive.")
+
+    if args.set_vdd and not 1000 <= args.set_vdd < 1600:
         raise ValueError("VDD value is out of range, must be in [1000: 1600[")
 
-    if args.set_osc and (int(args.set_osc) < 700 or int(args.set_osc) >= 1000):
+    if args.set_osc and not 700 <= args.set_osc < 1000:
         raise ValueError("OSC value is out of range, must be in [700: 1000[")
 
 
-def subprocess_verbose(args: Namespace, command_list: List[str], timeout: float = 10):
+_ECTOOL = ("ectool", "--interface=ci")
+
+
+def ectool_command(rank_path: str, *arguments: object) -> List[str]:
+    """Build the argument list of an ectool command for a rank.
+
+    Args:
+        rank_path (str): Rank path, e.g. /dev/dpu_rank0.
+        arguments: ectool command and its arguments.
+
+    Returns:
+        list of str: Command and its arguments.
+    """
+    return [*_ECTOOL, f"--name={rank_path}", *map(str, arguments)]
+
+
+def dfu_flash_command(firmware: str, device_name: str, force_unprotect: bool = False) -> List[str]:
+    """Build the argument list of a dfu-util command flashing the RO and RW partitions.
+
+    Args:
+        firmware (str): Path of the firmware file.
+        device_name (str): Device name read from dfu_util cmd.
+        force_unprotect (bool): Remove the flash write protection, which reboots the device.
+
+    Returns:
+        list of str: Command and its arguments.
+    """
+    address = f"{vpd.FLASH_BASE_ADDRESS + vpd.FLASH_OFF_RO}:{vpd.FLASH_SIZE_RO_RW}"
+    if force_unprotect:
+        address += ":force:unprotect"
+    return ["dfu-util", "-a", "0", "-s", address, "-D", firmware, "-p", device_name]
+
+
+def subprocess_verbose(args: Namespace, command_list: List[str], timeout: float = 10,
+                       capture_stdout: bool = False):
+    """Run a command, showing its output in verbose mode.
+
+    Unless capture_stdout is set, the output is not kept in memory: it goes straight to the
+    terminal in verbose mode, and is discarded otherwise. With --jobs > 1, the output is captured
+    in verbose mode too and printed with the output of the device (see run_on_devices).
+
+    Args:
+        args (Namespace): Arguments from command line or script.
+        command_list (list of str): Command and its arguments.
+        timeout (float): Timeout in seconds.
+        capture_stdout (bool): Keep the output in proc.stdout for the caller.
+
+    Returns:
+        subprocess.CompletedProcess: The finished process, stderr is always captured. Captured
+            output is decoded from UTF-8 to str.
+    """
+    # Output inherited by the child would bypass the per-device buffers of run_on_devices
+    print_output = args.verbose and (capture_stdout or getattr(args, 'jobs', 1) > 1)
+    if capture_stdout or print_output:
+        stdout = subprocess.PIPE
+    else:
+        stdout = None if args.verbose else subprocess.DEVNULL
+
     proc = subprocess.run(
         command_list,
         check=False,
         timeout=timeout,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE)
+        stdout=stdout,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+        errors="replace")
 
-    if args.verbose:
-        print(proc.stdout.decode())
+    if print_output:
+        with print_lock:
+            print(proc.stdout)
 
     return proc
 
 
+T = TypeVar('T')
+
+
+def run_on_devices(function: Callable[[str], T], device_list: Iterable[str],
+                   args: Namespace) -> List[T]:
+    """Run a function on each device, using up to --jobs worker threads.
+
+    Args:
+        function (Callable): Function called with each device name.
+        device_list (Iterable[str]): Devices to process.
+        args (Namespace): Arguments from command line or script.
+
+    Returns:
+        list: Results of the function, in the order of device_list.
+    """
+    devices = list(device_list)
+    jobs = min(getattr(args, 'jobs', 1), len(devices))
+    if jobs <= 1:
+        return [function(device) for device in devices]
+
+    # Progress messages of a device are printed in several parts: keep the output of each device
+    # in its own buffer, and print the buffers in the order of device_list.
+    output = ThreadOutput(sys.stdout)
+    buffers = [io.StringIO() for _ in devices]
+
+    def run_buffered(index: int) -> T:
+        output.local.buffer = buffers[index]
+        try:
+            return function(devices[index])
+        finally:
+            output.local.buffer = None
+
+    sys.stdout = output
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    futures = [executor.submit(run_buffered, index) for index in range(len(devices))]
+    printed = 0
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            while printed < len(futures) and futures[printed].done():
+                output.write(buffers[printed].getvalue())
+                printed += 1
+            output.flush()
+            if any(future.exception() is not None for future in done):
+                break
+    finally:
+        # On error (--stop-on-error, timeout) or Ctrl-C, do not start the devices that are still
+        # pending, but wait for the running ones and print their output.
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, buffer in zip(futures[printed:], buffers[printed:]):
+            if not future.cancelled():
+                output.write(buffer.getvalue())
+        output.flush()
+        sys.stdout = output.stream
+
+    # Raises the exception of the first device that failed
+    return [future.result() for future in futures]
+
+
 def apply_on_devices(operation: RankOperation, device_list: Iterable[str], args: Namespace) -> bool:
-    def try_apply(operation: RankOperation, device: str, args: Namespace) -> bool:
+    def try_apply(device: str) -> bool:
         try:
             operation(args, device)
             return False  # No error
         except RankError as e:
             if args.stop_on_error:
                 raise
-            print(e)
+            with print_lock:
+                print(e)
             return True  # Error occurred
 
-    error_statuses = [try_apply(operation, device, args) for device in device_list]
+    error_statuses = run_on_devices(try_apply, device_list, args)
     return any(error_statuses)
 
 
-T = TypeVar('T')
-
-
 def map_on_devices(operation: Callable[[str], T],
                    device_list: Iterable[str],
                    args: Namespace) -> tuple[bool, List[T]]:
-    def try_map(operation: Callable[[str], T], device: str) -> Optional[T]:
+    failed = object()  # Marks devices on which the operation raised
+
+    def try_map(device: str) -> Union[T, object]:
         try:
             return operation(device)  # No error
         except RankError as e:
             if args.stop_on_error:
                 raise
-            print(e)
-            return None  # Error occurred
+            with print_lock:
+                print(e)
+            return failed  # Error occurred
 
-    return_values = [try_map(operation, device) for device in device_list]
-    return None in return_values, list(filter(None, return_values))
+    error_mode = False
+    return_values: List[T] = []
+    for value in run_on_devices(try_map, device_list, args):
+        if value is failed:
+            error_mode = True
+        else:
+            return_values.append(cast(T, value))
+    return error_mode, return_values
 
 
 @rank_operation
 def vpd_mode(args: Namespace, rank_path: str):
-    # Make sure the options are correct.
-    # disable/enable_dpu on all ranks is at least suspect, so ask for a rank
+    # Make sure the options are correct, vpd_mode may be called by a script without
+    # validate_args(). disable/enable_dpu on all ranks is at least suspect, so ask for a rank
     # to be given.
     if (args.disable_dpu or args.enable_dpu) and not args.rank:
         raise ValueError("Error, you must specify at least a rank with --rank option.")
@@ -164,14 +373,12 @@ def vpd_mode(args: Namespace, rank_path: str):
             print(f"* VPD for {rank_path}")
             print(dimm_vpd)
         elif args.disable_dpu:
-            for dpu in args.disable_dpu:
-                slice_id = int(dpu.split(".")[0])
-                dpu_id = int(dpu.split(".")[1])
+            dpu_ids = getattr(args, 'disable_dpu_ids', None) or parse_dpu_ids(args.disable_dpu)
+            for slice_id, dpu_id in dpu_ids:
                 dimm_vpd.disable_dpu(slice_id, dpu_id)
         elif args.enable_dpu:
-            for dpu in args.enable_dpu:
-                slice_id = int(dpu.split(".")[0])
-                dpu_id = int(dpu.split(".")[1])
+            dpu_ids = getattr(args, 'enable_dpu_ids', None) or parse_dpu_ids(args.enable_dpu)
+            for slice_id, dpu_id in dpu_ids:
                 dimm_vpd.enable_dpu(slice_id, dpu_id)
 
 
@@ -182,83 +389,140 @@ def flash_mcu_mode(args: Namespace, rank_path: str):
         end='',
         flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} sysjump 1"
-    proc = subprocess_verbose(args, command.split(" "))
-    if proc.returncode != 0:
-        raise RankError("Failed to jump to RO FW.")
+    # (error message, command, timeout in seconds) of each step.
+    # ectool has no batch mode reading commands from stdin, so each step is a separate ectool
+    # process opening the rank. Each one is run directly with its own timeout: on timeout,
+    # subprocess kills ectool itself, so an erase or write cannot go on in the background.
+    steps = [
+        ("Failed to jump to RO FW.",
+         ectool_command(rank_path, "sysjump", 1), 10),
+        ("Failed to erase RW partition.",
+         ectool_command(rank_path, "flasherase", vpd.FLASH_OFF_RW, vpd.FLASH_SIZE_RW), 20),
+        ("Failed to write RW partition.",
+         ectool_command(rank_path, "flashwrite", vpd.FLASH_OFF_RW, args.flash_mcu), 200),
+        ("Failed to reboot MCU.",
+         ectool_command(rank_path, "reboot_ec", "cold"), 10),
+    ]
+    for error_message, command, timeout in steps:
+        proc = subprocess_verbose(args, command, timeout=timeout)
+        if proc.returncode != 0:
+            raise RankError(error_message)
 
-    command = (f"ectool --interface=ci --name={rank_path} flasherase {vpd.FLASH_OFF_RW} "
-               f"{vpd.FLASH_SIZE_RW}")
-    proc = subprocess_verbose(args, command.split(" "), timeout=20)
-    if proc.returncode != 0:
-        raise RankError("Failed to erase RW partition.")
+    print("Success.")
 
-    command = (f"ectool --interface=ci --name={rank_path} flashwrite {vpd.FLASH_OFF_RW} "
-               f"{args.flash_mcu}")
-    proc = subprocess_verbose(args, command.split(" "), timeout=200)
-    if proc.returncode != 0:
-        raise RankError("Failed to write RW partition.")
 
-    command = f"ectool --interface=ci --name={rank_path} reboot_ec cold"
-    proc = subprocess_verbose(args, command.split(" "))
-    if proc.returncode != 0:
-        raise RankError("Failed to reboot MCU.")
+# Information read from an upmem tty device: name, rank0, rank1, serial_number and usb_path
+# (USB port path of the DIMM, as used by dfu-util -p).
+TtyDevice = Dict[str, Optional[str]]
 
-    print("Success.")
+# sysfs directory listing the ttys of the usb-serial driver used by upmem DIMMs
+TTY_DRIVER_DIR = "/sys/bus/usb-serial/drivers/google"
+
+# Default time for a DIMM to reboot in or out of DFU mode, in seconds (--dfu-timeout)
+DFU_MODE_TIMEOUT = 30
+
+# Time given to DIMMs to reboot in DFU mode when their USB port is unknown, in seconds
+DFU_MODE_DELAY = 5
+
+# dfu-util -l is run by one thread at a time
+dfu_list_lock = threading.Lock()
+
+
+def list_tty_sysfs_paths() -> List[str]:
+    """List the sysfs paths of the ttys bound to the upmem usb-serial driver.
+
+    Returns:
+        list of str: sysfs paths, e.g. /sys/bus/usb-serial/drivers/google/ttyUSB0. Empty if the
+        driver is not loaded.
+    """
+    try:
+        with os.scandir(TTY_DRIVER_DIR) as entries:
+            return [entry.path for entry in entries if entry.name.startswith("tty")]
+    except FileNotFoundError:
+        return []
+
+
+def get_usb_device_dir(tty_dev: str) -> Optional[str]:
+    """Get the sysfs directory of the USB device owning a usb-serial tty.
+
+    Args:
+        tty_dev (str): sysfs path of the tty, e.g. /sys/bus/usb-serial/drivers/google/ttyUSB0.
+
+    Returns:
+        str: sysfs directory of the USB device, its name is the USB port path (e.g. 1-4.2). None
+            if the sysfs layout is not the expected one.
+    """
+    # tty_dev resolves to .../<usb device>/<usb interface>/ttyUSBx
+    usb_device = os.path.dirname(os.path.dirname(os.path.realpath(tty_dev)))
+    # USB devices have busnum and devpath attributes, USB interfaces do not
+    if not all(os.path.isfile(os.path.join(usb_device, attribute))
+               for attribute in ("busnum", "devpath")):
+        return None
+    return usb_device
 
 
-def get_usb_infos(args: Namespace) -> tuple[bool, pd.DataFrame]:
+def get_usb_infos(args: Namespace) -> tuple[bool, Dict[str, TtyDevice]]:
     """Get serial number and rank information from upmem tty devices.
 
     Returns:
         bool: False if success, True otherwise.
 
-        pandas.DataFrame: Informations of all upmem tty devices.
+        dict: Informations of all upmem tty devices, indexed by tty device name.
 
     Raises:
         RankError: If an error occurs while retrieving USB information.
     """
-    def get_tty_device(tty_dev: str) -> Dict[str, Optional[str]]:
-        tty_device: Dict[str, Optional[str]] = {}
+    def get_tty_device(tty_dev: str) -> TtyDevice:
+        tty_device: TtyDevice = {}
         tty_device['name'] = os.path.basename(tty_dev)
         tty_device['rank0'] = None
         tty_device['rank1'] = None
         tty_device['serial_number'] = None
-                
+        tty_device['usb_path'] = None
+
         device_name = os.path.basename(tty_dev)
-        
-        bytes_array = serial_send_cmd(args, device_name, b'dimm\n', timeout=0.5)
+
+        # The DIMM comes back on the same USB port in DFU mode
+        usb_device = get_usb_device_dir(tty_dev)
+        if usb_device is not None:
+            tty_device['usb_path'] = os.path.basename(usb_device)
+
+        # The S/N ends the answer line, after the ranks
+        bytes_array = serial_send_cmd(args, device_name, b'dimm\n', timeout=0.5,
+                                      last_line=lambda line: b'S/N' in line)
 
         if(bytes_array == None):
             return tty_device
             
         # 5. Parse output, typical string : DIMM '' S/N 12634275
-        strings = [b.decode('utf-8') for b in bytes_array]
-        for s in strings:
-            match_serial = re.search(r'S/N (\w+)\r\n', s)
-            match_rank = re.findall(r"'(dpu_rank\d+)'", s)
+        for line in bytes_array:
+            match_serial = _SN_RE.search(line)
+            match_rank = _RANK_RE.findall(line)
             if match_serial:
-                tty_device['serial_number'] = match_serial.group(1)
+                tty_device['serial_number'] = match_serial.group(1).decode()
             if match_rank:
-                tty_device['rank0'] = match_rank[0]
-                tty_device['rank1'] = match_rank[1]
+                tty_device['rank0'] = match_rank[0].decode()
+                tty_device['rank1'] = match_rank[1].decode()
 
         return tty_device
 
     # Loop over all tty devices
-    error_mode, tty_devices = map_on_devices(
-        get_tty_device, glob.iglob("/sys/bus/usb-serial/drivers/google/tty*"), args)
+    error_mode, tty_devices = map_on_devices(get_tty_device, list_tty_sysfs_paths(), args)
+
+    # 6. Index devices by tty name
+    return error_mode, {device['name']: device for device in tty_devices}
 
-    # 6. Create dataframe from list of dict
-    df = pd.DataFrame(tty_devices, index=None)
-    return error_mode, df
+
+def print_tty_devices(tty_devices: Dict[str, TtyDevice]) -> None:
+    pd = import_pandas()
+    print(pd.DataFrame(list(tty_devices.values())))
 
 
 @global_operation
-def usb_info_mode(args: Namespace, rank_path_list: List[str]) -> None:
+def usb_info_mode(args: Namespace, rank_path_list: Iterable[str]) -> None:
     del rank_path_list
-    error_mode, df_info = get_usb_infos(args)
-    print(df_info)
+    error_mode, tty_devices = get_usb_infos(args)
+    print_tty_devices(tty_devices)
     if error_mode:
         raise RuntimeError("At least one error occurred while retrieving USB information.")
 
@@ -278,60 +542,99 @@ def flash_dimm_dfu(args: Namespace, device_name: str) -> None:
     print(f"* Flashing upmem USB devices {device_name}...",
           end='', flush=True)
 
-    command = (f"dfu-util -a 0 -s {vpd.FLASH_BASE_ADDRESS + vpd.FLASH_OFF_RO}:"
-               f"{vpd.FLASH_SIZE_RO_RW} -D {args.flash_mcu_dfu} -p {device_name}")
+    command = dfu_flash_command(args.flash_mcu_dfu, device_name)
     if not args.dry_run:
-        proc = subprocess_verbose(args, command.split(" "), timeout=30)
+        proc = subprocess_verbose(args, command, timeout=30)
         if proc.returncode != 0:
             raise RankError(f"Failed to flash device {device_name}")
     else:
-        print(command)
+        print(shlex.join(command))
 
-    command = (f"dfu-util -a 0 -s {vpd.FLASH_BASE_ADDRESS + vpd.FLASH_OFF_RO}:"
-               f"{vpd.FLASH_SIZE_RO_RW}:force:unprotect -D {args.flash_mcu_dfu} -p {device_name}")
+    command = dfu_flash_command(args.flash_mcu_dfu, device_name, force_unprotect=True)
     if not args.dry_run:
-        proc = subprocess_verbose(args, command.split(" "), timeout=30)
+        proc = subprocess_verbose(args, command, timeout=30)
         if proc.returncode != 0:
             raise RankError(f"Failed to reboot device {device_name}")
     else:
-        print(command)
+        print(shlex.join(command))
 
     print("Success")
 
 
-def serial_send_cmd(args: Namespace, device_name: str, cmd: str, timeout=2, read_response=True):
-     response = ""
-     if not args.dry_run:
-        # 1. Open connection with tty device
-        try:
-            tty_ser = serial.Serial(
-                f"/dev/{device_name}", baudrate=115200, timeout=timeout)
-        except serial.SerialTimeoutException as e:
-            raise RankError(f"Device {device_name}: {e}") from e
-        
-        # 2. Flush console
-        tty_ser.readlines()
+def serial_send_cmd(args: Namespace, device_name: str, cmd: bytes, timeout=2, read_response=True,
+                    last_line: Optional[Callable[[bytes], bool]] = None):
+    """Send a command on the console of an upmem tty device.
+
+    Args:
+        args (Namespace): Arguments from command line or script.
+        device_name (str): 'ttyUSBX' for example.
+        cmd (bytes): Command to send.
+        timeout (float): Time to wait for the answer, in seconds.
+        read_response (bool): Whether to read the answer at all.
+        last_line (Callable): If given, stop reading as soon as a line satisfies it instead of
+            waiting for the console to be silent for timeout seconds.
+
+    Returns:
+        list of bytes: Lines of the answer (empty if read_response is False), None in dry-run
+            mode.
 
-        # 3.  Send cmd
+    Raises:
+        RankError: If the communication with the device fails.
+    """
+    if args.dry_run:
+        return None
+
+    # In some case we don't want to read from serial device at all (reboot device for example):
+    # write the command without configuring the serial line, the kernel keeps the previous setup.
+    if not read_response:
         try:
-            tty_ser.write(cmd)
-        except serial.SerialException as e:
-            raise RankError(f"Device {device_name}: {e}") from e
-        
-        #In some case we don't want to read from serial device at all (reboot device for example)
-        if(read_response):
-            # 4. Read output
+            fd = os.open(f"/dev/{device_name}", os.O_WRONLY | os.O_NOCTTY)
             try:
-                response = tty_ser.readlines()
-            except serial.SerialException as e:
-                raise RankError(f"Device {device_name}: {e}") from e
+                os.write(fd, cmd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            raise RankError(f"Device {device_name}: {e}") from e
+        return []
+
+    serial = import_serial()
+
+    # 1. Open connection with tty device
+    try:
+        tty_ser = serial.Serial(
+            f"/dev/{device_name}", baudrate=115200, timeout=timeout)
+    except serial.SerialTimeoutException as e:
+        raise RankError(f"Device {device_name}: {e}") from e
+
+    # 2. Flush console
+    tty_ser.reset_input_buffer()
+
+    # 3.  Send cmd
+    try:
+        tty_ser.write(cmd)
+    except serial.SerialException as e:
+        raise RankError(f"Device {device_name}: {e}") from e
+
+    # 4. Read output until the console is silent, the expected line or the deadline
+    response = []
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            line = tty_ser.readline()
+            if not line:
+                break
+            response.append(line)
+            if last_line and last_line(line):
+                break
+    except serial.SerialException as e:
+        raise RankError(f"Device {device_name}: {e}") from e
+
+    # 5. Close connection
+    tty_ser.close()
+
+    return response
 
-        # 5. Close connection
-        tty_ser.close()
-        
-        return response
 
-    
 @rank_operation
 def set_dimm_dfu_mode(args: Namespace, device_name: str) -> None:
     """set upmem tty device in DFU mode.
@@ -346,9 +649,39 @@ def set_dimm_dfu_mode(args: Namespace, device_name: str) -> None:
     print(f"* USB {device_name} set in DFU mode", end='\n', flush=True)
     dfu_cmd=(b'\n\n\ndfu\n')
     serial_send_cmd(args, device_name, dfu_cmd,read_response=False)
-    # 4. Wait for devices to reboot in DFU mode
-    if(not args.dry_run):
-        time.sleep(5)
+
+
+def get_tty_usb_paths() -> List[str]:
+    """Get the USB port paths of the upmem tty devices, i.e. of the devices out of DFU mode.
+
+    Returns:
+        list of str: USB port paths, as listed by dfu-util.
+    """
+    usb_devices = map(get_usb_device_dir, list_tty_sysfs_paths())
+    return [os.path.basename(usb_device) for usb_device in usb_devices if usb_device is not None]
+
+
+def wait_usb_device(args: Namespace, usb_path: str, dfu_mode: bool = True) -> None:
+    """Wait for a device to reboot in or out of DFU mode.
+
+    Args:
+        args (Namespace): Arguments from command line or script.
+        usb_path (str): USB port path of the device, as listed by dfu-util.
+        dfu_mode (bool): Wait for the device in DFU mode if True, for its tty device otherwise.
+
+    Raises:
+        RankError: If the device is not back after --dfu-timeout seconds.
+    """
+    if args.dry_run:
+        return
+
+    list_usb_paths = get_dfu_devices if dfu_mode else get_tty_usb_paths
+    deadline = time.monotonic() + getattr(args, 'dfu_timeout', DFU_MODE_TIMEOUT)
+    while usb_path not in list_usb_paths():
+        if time.monotonic() >= deadline:
+            state = "in" if dfu_mode else "out of"
+            raise RankError(f"Device {usb_path} did not reboot {state} DFU mode")
+        time.sleep(0.5)
 
 
 def get_dfu_devices() -> List[str]:
@@ -357,13 +690,12 @@ def get_dfu_devices() -> List[str]:
     Returns:
         list of str: List of upmem devices in DFU mode.
     """
-    command = "dfu-util -l"
-    proc = subprocess.run(command.split(" "),
-                          check=False,
-                          stdout=subprocess.PIPE,
-                          stderr=subprocess.PIPE)
-    pattern = re.compile(r'Found DFU: \[0483:df11\].*?path="(.*?)"', re.MULTILINE)
-    match = pattern.findall(proc.stdout.decode())
+    with dfu_list_lock:
+        proc = subprocess.run(["dfu-util", "-l"],
+                              check=False,
+                              capture_output=True,
+                              text=True)
+    match = _DFU_RE.findall(proc.stdout)
     return list(set(match))
 
 
@@ -380,59 +712,66 @@ def exit_dfu_mode(args: Namespace, device_name: str) -> None:
     """
     print(f"* Exiting DFU mode for upmem devices {device_name}...",
           end='', flush=True)
-    command = (f"dfu-util -a 0 -s {vpd.FLASH_BASE_ADDRESS + vpd.FLASH_OFF_RO}:"
-               f"{vpd.FLASH_SIZE_RO_RW}:force:unprotect -D {args.flash_mcu_dfu} -p {device_name}")
+    command = dfu_flash_command(args.flash_mcu_dfu, device_name, force_unprotect=True)
     if not args.dry_run:
-        proc = subprocess_verbose(args, command.split(" "), timeout=30)
+        proc = subprocess_verbose(args, command, timeout=30)
         if proc.returncode != 0:
             raise RankError(f"Failed to reboot device {device_name}, or device didn't exist")
     else:
-        print(command)
+        print(shlex.join(command))
 
-    print("Success")
+    wait_usb_device(args, device_name, dfu_mode=False)
 
-    time.sleep(5)
+    print("Success")
 
 
-def find_devices_by_serial_number(df: pd.DataFrame, serial_numbers: str,
+def find_devices_by_serial_number(tty_devices: Dict[str, TtyDevice], serial_numbers: str,
                                   args: Namespace) -> tuple[bool, List[str]]:
+    names_by_serial_number = {device['serial_number']: name
+                              for name, device in tty_devices.items()
+                              if device['serial_number'] is not None}
+
     def query_serial_number(sernum: str) -> str:
-        row = df.query(f'serial_number == "{sernum}"')
-        if row.empty:
+        device_name = names_by_serial_number.get(sernum)
+        if device_name is None:
             raise RankError(f"Serial number {sernum} does not exist")
-        return row['name'].iloc[0]
+        return device_name
 
     return map_on_devices(query_serial_number, serial_numbers.split(","), args)
 
 
-def find_devices_by_rank(df: pd.DataFrame, rank_path_list: List[str],
+def find_devices_by_rank(tty_devices: Dict[str, TtyDevice], rank_path_list: Iterable[str],
                          args: Namespace) -> tuple[bool, List[str]]:
+    names_by_rank = {rank: name
+                     for name, device in tty_devices.items()
+                     for rank in (device['rank0'], device['rank1'])
+                     if rank is not None}
+
     def query_rank(rank: str) -> str:
-        match = re.search(r"dpu_rank\d{1,2}$", rank)
+        match = _RANK_PATH_RE.search(rank)
         if not match:
             raise RankError(f"Error, {rank} path is invalid. It should be /dev/dpu_rankxx")
         rank_name = match.group(0)
-        row = df.query(f'rank0 == "{rank_name}" or rank1 == "{rank_name}"')
-        if row.empty:
+        device_name = names_by_rank.get(rank_name)
+        if device_name is None:
             raise RankError(f"Rank {rank_name} does not exist")
-        device_name = row['name'].iloc[0]
         print(f"Rank {rank_name} found on /dev/{device_name}")
         return device_name
 
     return map_on_devices(query_rank, rank_path_list, args)
 
 
-def get_tty_devices(df: pd.DataFrame, args: Namespace,
-                    rank_path_list: List[str]) -> tuple[bool, Iterable[str]]:
+def get_tty_devices(tty_devices: Dict[str, TtyDevice], args: Namespace,
+                    rank_path_list: Iterable[str]) -> tuple[bool, Iterable[str]]:
     if args.sernum != "":
-        return find_devices_by_serial_number(df, args.sernum, args)
+        return find_devices_by_serial_number(tty_devices, args.sernum, args)
     if args.rank != "":
-        return find_devices_by_rank(df, rank_path_list, args)
-    return False, df['name'].astype(str).tolist()
+        return find_devices_by_rank(tty_devices, rank_path_list, args)
+    return False, list(tty_devices)
 
 
 @global_operation
-def flash_mcu_dfu_mode(args: Namespace, rank_path_list: List[str]) -> None:
+def flash_mcu_dfu_mode(args: Namespace, rank_path_list: Iterable[str]) -> None:
     error_mode = False
 
     ##########################################################################
@@ -444,32 +783,48 @@ def flash_mcu_dfu_mode(args: Namespace, rank_path_list: List[str]) -> None:
     ##########################################################################
     # 1. Retrieve a list of all upmem tty devices
     ##########################################################################
-    usb_error, df = get_usb_infos(args)
+    usb_error, tty_devices = get_usb_infos(args)
     error_mode |= usb_error
-    print(df)
+    print_tty_devices(tty_devices)
 
-    if df.empty:
+    if not tty_devices:
         raise RuntimeError("No upmem USB device was found, check USB connection!")
 
     ##########################################################################
     # 2. Filter user input and create a list of tty devices to be flashed
     ##########################################################################
-    tty_error, list_tty_devices = get_tty_devices(df, args, rank_path_list)
+    tty_error, tty_device_names = get_tty_devices(tty_devices, args, rank_path_list)
     error_mode |= tty_error
-    list_tty_devices = list(set(list_tty_devices))
+    list_tty_devices = sorted(set(tty_device_names))
 
     ##########################################################################
-    # 3. Put devices in DFU mode
+    # 3. Put each device in DFU mode and flash it as soon as it is ready
     ##########################################################################
+    unknown_usb_path = []
+
+    def flash_tty_device(args: Namespace, device_name: str) -> None:
+        usb_path = tty_devices[device_name]['usb_path']
+        set_dimm_dfu_mode(args, device_name)
+        if usb_path is None:
+            # Cannot wait for this device, it is flashed in step 4
+            unknown_usb_path.append(device_name)
+            return
+        wait_usb_device(args, usb_path)
+        flash_dimm_dfu(args, usb_path)
+
     print(f"The following dimms will be flashed: {list_tty_devices}")
-    error_mode |= apply_on_devices(set_dimm_dfu_mode, list_tty_devices, args)
+    error_mode |= apply_on_devices(flash_tty_device, list_tty_devices, args)
 
     ##########################################################################
-    # 4. Flash devices
+    # 4. Flash the devices still in DFU mode that were not flashed in step 3: devices whose USB
+    #    port is unknown, and devices that did not exit DFU mode in step 0
     ##########################################################################
-
-    list_dfu_devices = get_dfu_devices()
-    if not list_dfu_devices and not args.dry_run:
+    if unknown_usb_path and not args.dry_run:
+        time.sleep(DFU_MODE_DELAY)
+    flashed_usb_paths = {tty_devices[name]['usb_path'] for name in list_tty_devices}
+    list_dfu_devices = sorted(usb_path for usb_path in get_dfu_devices()
+                              if usb_path not in flashed_usb_paths)
+    if unknown_usb_path and not list_dfu_devices and not args.dry_run:
         raise RuntimeError("No devices are in DFU mode")
     error_mode |= apply_on_devices(flash_dimm_dfu, list_dfu_devices, args)
 
@@ -511,20 +866,18 @@ def vdd_mode(args: Namespace, rank_path: str) -> None:
         end='',
         flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} vdd"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "vdd"), capture_stdout=True)
     if proc.returncode != 0:
         raise RankError("Failed to get VDD.")
 
-    print(proc.stdout.decode().rstrip())
+    print(proc.stdout.rstrip())
 
 
 @rank_operation
 def reboot_mode(args: Namespace, rank_path: str) -> None:
     print(f"* Rebooting rank {rank_path}...", end='', flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} reboot_ec RW"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "reboot_ec", "RW"))
     if proc.returncode != 0:
         raise RankError("Failed to reboot.")
 
@@ -535,12 +888,12 @@ def reboot_mode(args: Namespace, rank_path: str) -> None:
 def mcu_version_mode(args: Namespace, rank_path: str) -> None:
     print(f"* MCU firmware of rank {rank_path}: ", end='', flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} version"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "version"), capture_stdout=True)
     if proc.returncode != 0:
         raise RankError("Failed to print MCU firmware versions.")
 
-    ro_version, rw_version, fw_copy = proc.stdout.decode().split('\n')[0:3]
+    # Short or truncated output leaves the missing lines empty
+    ro_version, rw_version, fw_copy = (proc.stdout.splitlines() + ["", "", ""])[:3]
     print("")
     print(f"\t{ro_version}")
     print(f"\t{rw_version}")
@@ -551,12 +904,11 @@ def mcu_version_mode(args: Namespace, rank_path: str) -> None:
 def osc_mode(args: Namespace, rank_path: str) -> None:
     print(f"* Frequency of rank {rank_path}: ", end='', flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} osc"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "osc"), capture_stdout=True)
     if proc.returncode != 0:
         raise RankError("Failed to print FCK frequency.")
 
-    fck, div = proc.stdout.decode().split('\n')[0:2]
+    fck, div = (proc.stdout.splitlines() + ["", ""])[:2]
     print("")
     print(f"\t{fck}")
     print(f"\t{div}", end="\n\n")
@@ -566,12 +918,12 @@ def osc_mode(args: Namespace, rank_path: str) -> None:
 def database_mode(args: Namespace, rank_path: str) -> None:
     print(f"* VPD database for {rank_path}: ", end='', flush=True)
 
-    db_path = "db.bin"
+    db_path = f"db_{os.path.basename(rank_path)}.bin"
 
     # Read flash segment info file
-    command = (f"ectool --interface=ci --name={rank_path} flashread {vpd.FLASH_OFF_VPD_DB} "
-               f"{vpd.FLASH_SIZE_VPD_DB} {db_path}")
-    proc = subprocess_verbose(args, command.split(" "))
+    command = ectool_command(rank_path, "flashread", vpd.FLASH_OFF_VPD_DB, vpd.FLASH_SIZE_VPD_DB,
+                             db_path)
+    proc = subprocess_verbose(args, command)
     if proc.returncode != 0:
         raise RankError("Failed to read VPD database flash segment.")
 
@@ -584,6 +936,35 @@ def database_mode(args: Namespace, rank_path: str) -> None:
     os.remove(db_path)
 
 
+def _add_db_byte(db: DPUVpdDatabase, key: str, val: str) -> None:
+    db.add_byte(key, int(val))
+
+
+def _add_db_short(db: DPUVpdDatabase, key: str, val: str) -> None:
+    db.add_short(key, int(val))
+
+
+def _add_db_string(db: DPUVpdDatabase, key: str, val: str) -> None:
+    db.add_string(key, val)
+
+
+# Database keys read by the MCU FW, with the value type it expects (same as gen_db.py)
+_DB_DISPATCH: Dict[str, Callable[[DPUVpdDatabase, str, str], None]] = {
+    'div_min': _add_db_byte,
+    'div_max': _add_db_byte,
+    'fck': _add_db_short,
+    'fck_min': _add_db_short,
+    'fck_max': _add_db_short,
+    'vdd_limit': _add_db_short,
+    'ltc7106_rfb1': _add_db_short,
+    'ltc7106_rfb2': _add_db_short,
+    'ltc7106_vref': _add_db_short,
+    'ltc7106_vdddpu': _add_db_short,
+    'vdddpu': _add_db_short,
+    'chip_version': _add_db_string,
+}
+
+
 @rank_operation
 def update_db_mode(args: Namespace, rank_path: str) -> None:
     print(
@@ -592,10 +973,10 @@ def update_db_mode(args: Namespace, rank_path: str) -> None:
         flush=True)
 
     # Read flash segment into file
-    db_path = "db.bin"
-    command = (f"ectool --interface=ci --name={rank_path} flashread {vpd.FLASH_OFF_VPD_DB} "
-               f"{vpd.FLASH_SIZE_VPD_DB} {db_path}")
-    proc = subprocess_verbose(args, command.split(" "))
+    db_path = f"db_{os.path.basename(rank_path)}.bin"
+    command = ectool_command(rank_path, "flashread", vpd.FLASH_OFF_VPD_DB, vpd.FLASH_SIZE_VPD_DB,
+                             db_path)
+    proc = subprocess_verbose(args, command)
     if proc.returncode != 0:
         raise RankError("Failed to read VPD database flash segment.")
 
@@ -607,12 +988,9 @@ def update_db_mode(args: Namespace, rank_path: str) -> None:
     # (otherwise the MCU might read past the value)
     d = dict(pair.split('=') for pair in args.update_db)
     for key, val in d.items():
-        if key in ('div_min', 'div_max'):
-            db.add_byte(key, int(val))
-        elif key in ('fck', 'fck_min', 'fck_max', 'div_min', 'div_max', 'vdddpu', 'chip_version'):
-            db.add_short(key, int(val))
-        elif key in ('chip_version'):
-            db.add_string(key, val)
+        handler = _DB_DISPATCH.get(key)
+        if handler:
+            handler(db, key, val)
         elif val.isnumeric():
             db.add_numeric(key, int(val))
         else:
@@ -627,12 +1005,11 @@ def update_db_mode(args: Namespace, rank_path: str) -> None:
 
 @rank_operation
 def set_vdd_mode(args: Namespace, rank_path: str) -> None:
-    vdd_value = int(args.set_vdd)
+    vdd_value = args.set_vdd
 
     print(f"* Setting voltage to {vdd_value} mV for rank {rank_path}: ", end='', flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} vdd {vdd_value}"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "vdd", vdd_value))
     if proc.returncode != 0:
         raise RankError("Failed to set VDD.")
 
@@ -641,12 +1018,11 @@ def set_vdd_mode(args: Namespace, rank_path: str) -> None:
 
 @rank_operation
 def set_osc_mode(args: Namespace, rank_path: str) -> None:
-    osc_value = int(args.set_osc)
+    osc_value = args.set_osc
 
     print(f"* Setting osc to {osc_value} MHz for rank {rank_path}: ", end='', flush=True)
 
-    command = f"ectool --interface=ci --name={rank_path} osc {osc_value}"
-    proc = subprocess_verbose(args, command.split(" "))
+    proc = subprocess_verbose(args, ectool_command(rank_path, "osc", osc_value))
     if proc.returncode != 0:
         raise RankError("Failed to set OSC.")
 
@@ -694,7 +1070,7 @@ def parse_args():
         '--flash-mcu-dfu',
         metavar='<fw_path>',
         help=("Flash *ALL* MCUs connected with USB cable with the firmware given in argument, "
-              "--rank option is not used and it requires dfu-util."))
+              "--rank option is not used and it requires dfu-util, pyserial and pandas."))
     parser.add_argument(
         '--flash-vpd',
         metavar='<vpd_path>',
@@ -743,7 +1119,7 @@ def parse_args():
     parser.add_argument(
         '--usb-info',
         action='store_true',
-        help="Dispay dimm serial number and its associated ranks")
+        help="Dispay dimm serial number and its associated ranks (requires pyserial and pandas)")
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -752,6 +1128,19 @@ def parse_args():
         '--stop-on-error',
         action='store_true',
         help="Stop on first error")
+    parser.add_argument(
+        '--jobs',
+        metavar='<N>',
+        type=int,
+        default=1,
+        help="Number of ranks or USB devices processed in parallel (default: 1)")
+    parser.add_argument(
+        '--dfu-timeout',
+        metavar='<seconds>',
+        type=float,
+        default=DFU_MODE_TIMEOUT,
+        help=("Time to wait for a DIMM to reboot in or out of DFU mode in --flash-mcu-dfu mode "
+              f"(default: {DFU_MODE_TIMEOUT})"))
 
     args = parser.parse_args()
     validate_args(args)
@@ -789,7 +1178,8 @@ def main():
     args, parser = parse_args()
 
     # Get the ranks to work on.
-    rank_path_list: List[str] = args.rank.split(",") if args.rank else glob.glob("/dev/dpu_rank*")
+    rank_path_list: Iterable[str] = (args.rank.split(",") if args.rank
+                                     else sorted(glob.glob("/dev/dpu_rank*")))
 
     action = next((func for arg, func in mode_functions if getattr(args, arg, None)), None)
 
@@ -1,71 +1,297 @@
-import numpy as np
+import array
+import ctypes
+import functools
+import os
+import sys
+
+# NumPy 가 없으면 read_cache 를 array('i') 로 만들고 ntt_stage_swar 로 계산합니다.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 환경 변수 NTT_NUMBA=1 이면 stage 루프를 Numba 로 JIT 컴파일합니다 (아래 ntt_stage 선택 참고).
+# numba import 와 JIT 컴파일(캐시 로딩) 시간 때문에 256 개에서도, 2^20 개에서도 NumPy 보다 느려서
+# 기본값으로는 사용하지 않습니다.
+njit = None
+if os.environ.get("NTT_NUMBA") == "1":
+    try:
+        from numba import njit
+    except ImportError:
+        pass
 
 def butterfly(p, q, w):
     """
     C 코드의 버터플라이 연산을 int32 타입으로 정확히 시뮬레이션합니다.
+    p, q 는 스칼라 또는 같은 모양의 int32 배열(여러 버터플라이를 한 번에 계산)일 수 있습니다.
     """
     # np.int64로 중간 계산을 수행하여 파이썬의 자동 승격(promotion)을 방지하고
     # C와 동일한 int32 오버플로우를 흉내 냅니다.
+    # w 는 파이썬 int 로 곱해도 결과가 int64 로 유지되므로 따로 변환하지 않고,
+    # q * w 는 한 번만 계산해 두 결과에 재사용합니다. w == 1 (omega^0) 이면 곱셈을 생략합니다.
     p_long = np.int64(p)
-    q_long = np.int64(q)
-    w_long = np.int64(w)
-    
-    result_p = p_long + q_long * w_long
-    result_q = p_long - q_long * w_long
-    
+    q_w = np.int64(q)
+    if w != 1:
+        q_w = q_w * int(w)
+
+    result_p = p_long + q_w
+    result_q = p_long - q_w
+
     # C의 int32_t처럼 32비트로 자른(오버플로우된) 결과를 반환합니다.
     return np.int32(result_p), np.int32(result_q)
 
+def ntt_stage_numpy(buf, stage, w):
+    """
+    한 stage 의 모든 버터플라이(C 코드의 내부 루프)를 NumPy 슬라이싱으로 한 번에 계산합니다.
+    """
+    # C 코드의 인덱싱 로직 index = (i // stage) * (2 * stage) + (i % stage) 는
+    # 배열을 (-1, 2 * stage) 모양으로 본 뒤 각 행의 앞쪽 stage 개(top)를 행 순서대로 나열한 것과 같고,
+    # bottom = index + stage 는 각 행의 뒤쪽 stage 개입니다.
+    # reshape 는 연속 배열의 view 를 돌려주므로 C 코드와 동일하게 "in-place" 로 덮어씁니다.
+    blocks = buf.reshape(-1, 2 * stage)
+    top = blocks[:, :stage]
+    bottom = blocks[:, stage:]
+    top[:], bottom[:] = butterfly(top, bottom, w)
+
+def ntt_stage_pair_numpy(buf, stage, w):
+    """
+    stage 와 2 * stage 두 단계를 한 번에 계산합니다 (radix-4 처럼 4 * stage 구간 단위).
+    각 구간을 stage 개씩 a, b, c, d 로 나누면 stage 단계는 (a, b), (c, d) 를,
+    2 * stage 단계는 그 결과의 (a, c), (b, d) 를 버터플라이하므로 중간 결과를 buf 에
+    다시 쓰지 않고 한 번만 저장합니다.
+    """
+    blocks = buf.reshape(-1, 4 * stage)
+    a = blocks[:, :stage]
+    b = blocks[:, stage:2 * stage]
+    c = blocks[:, 2 * stage:3 * stage]
+    d = blocks[:, 3 * stage:]
+    a1, b1 = butterfly(a, b, w)
+    c1, d1 = butterfly(c, d, w)
+    a[:], c[:] = butterfly(a1, c1, w)
+    b[:], d[:] = butterfly(b1, d1, w)
+
+def ntt_stage_scalar(buf, stage, w):
+    """
+    한 stage 의 모든 버터플라이를 C 코드와 같은 스칼라 루프로 계산합니다 (Numba JIT 용).
+    Numba 는 int32 곱을 int64 로 계산하고 int32 배열에 저장할 때 C 와 같이 32비트로 자릅니다.
+    """
+    # stage 는 2의 거듭제곱이므로 i // stage 는 i >> shift, i % stage 는 i & mask 와 같습니다.
+    shift = 0
+    while (1 << shift) < stage:
+        shift += 1
+    mask = stage - 1
+
+    if w == 1:
+        # omega^0 = 1: 곱셈 없이 덧셈/뺄셈만 합니다.
+        for i in range(buf.shape[0] // 2):
+            top = ((i >> shift) << (shift + 1)) + (i & mask)
+            bottom = top + stage
+            p = buf[top]
+            q = buf[bottom]
+            buf[top] = p + q
+            buf[bottom] = p - q
+        return
+
+    for i in range(buf.shape[0] // 2):
+        top = ((i >> shift) << (shift + 1)) + (i & mask)
+        bottom = top + stage
+        p = buf[top]
+        prod = buf[bottom] * w
+        buf[top] = p + prod
+        buf[bottom] = p - prod
+
+def ntt_stage_pair_scalar(buf, stage, w):
+    """
+    ntt_stage_pair_numpy 와 같이 stage, 2 * stage 두 단계를 스칼라 루프로 계산합니다 (Numba JIT 용).
+    4개 원소를 한 번 읽어 두 단계의 버터플라이를 지역 변수로 계산한 뒤 한 번만 저장합니다.
+    """
+    shift = 0
+    while (1 << shift) < stage:
+        shift += 1
+    mask = stage - 1
+
+    for i in range(buf.shape[0] // 4):
+        ia = ((i >> shift) << (shift + 2)) + (i & mask)
+        ib = ia + stage
+        ic = ib + stage
+        id_ = ic + stage
+        a = buf[ia]
+        b = buf[ib]
+        c = buf[ic]
+        d = buf[id_]
+        if w != 1:
+            b = b * w
+            d = d * w
+        # 중간 결과도 C 처럼 int32 로 잘라야 두 단계를 따로 계산한 것과 같아집니다.
+        a, b = np.int32(a + b), np.int32(a - b)
+        c, d = np.int32(c + d), np.int32(c - d)
+        if w != 1:
+            c = c * w
+            d = d * w
+        buf[ia] = a + c
+        buf[ic] = a - c
+        buf[ib] = b + d
+        buf[id_] = b - d
+
+# --- NumPy 가 없을 때의 SWAR 커널 ---
+# 32비트 lane n 개를 하나의 파이썬 int 로 묶으면, 한 stage 의 덧셈/뺄셈을 lane 마다 루프를 돌지 않고
+# 큰 정수 연산 몇 번으로 끝낼 수 있습니다. lane 사이로 넘어가는 올림/내림은 최상위 비트를 따로
+# 계산해서 막습니다.
+M32 = 0xFFFFFFFF
+
+@functools.lru_cache(maxsize=None)
+def swar_masks(n, stage):
+    """
+    lane n 개를 묶은 int 에 쓰는 마스크 (top, high, even) 를 만듭니다.
+    top 은 각 2 * stage 구간의 앞쪽 stage 개 lane, high 는 그 lane 들의 최상위 비트,
+    even 은 짝수 번째 lane 입니다 (w != 1 일 때 곱셈을 짝수/홀수 lane 으로 나눠서 계산).
+    """
+    top = int.from_bytes((b"\xff" * 4 * stage + b"\x00" * 4 * stage) * (n // (2 * stage)), "little")
+    high = top & int.from_bytes(b"\x00\x00\x00\x80" * n, "little")
+    even = int.from_bytes((b"\xff" * 4 + b"\x00" * 4) * (n // 2), "little")
+    return top, high, even
+
+def swar_pack(buf):
+    """
+    array('i') 를 lane 0 이 최하위 32비트인 int 로 묶습니다.
+    """
+    if sys.byteorder == "big":
+        buf = array.array("i", buf)
+        buf.byteswap()
+    return int.from_bytes(buf.tobytes(), "little")
+
+def swar_unpack(x, buf):
+    """
+    swar_pack() 으로 묶은 int 를 buf 에 다시 풀어 씁니다.
+    """
+    values = array.array("i", x.to_bytes(4 * len(buf), "little"))
+    if sys.byteorder == "big":
+        values.byteswap()
+    buf[:] = values
+
+def ntt_stage_swar(buf, stage, w):
+    """
+    한 stage 의 모든 버터플라이를 SWAR 로 계산합니다 (buf 는 array('i')).
+    """
+    n = len(buf)
+    top, high, even = swar_masks(n, stage)
+    low = top ^ high
+    x = swar_pack(buf)
+    p = x & top
+    q = (x >> (32 * stage)) & top
+    if w != 1:
+        # lane 곱은 64비트까지 커지므로 짝수/홀수 lane 을 따로 곱해 옆 lane 이 비어 있게 한 뒤
+        # 각 lane 의 하위 32비트만 남깁니다.
+        w = int(w) & M32
+        odd = ((1 << (32 * n)) - 1) ^ even
+        q = ((q & even) * w & even) | ((q & odd) * w & odd)
+    # 최상위 비트를 뺀 31비트끼리 계산하면 lane 밖으로 올림/내림이 생기지 않습니다.
+    result_p = ((p & low) + (q & low)) ^ ((p ^ q) & high)
+    result_q = ((p | high) - (q & low)) ^ ((p ^ q ^ high) & high)
+    swar_unpack(result_p | (result_q << (32 * stage)), buf)
+
+def load_avx2_stage():
+    """
+    ntt_avx2.c 를 빌드한 ntt_avx2.so 가 스크립트 옆에 있으면 그 stage 커널을 돌려줍니다.
+    빌드: gcc -O3 -shared -fPIC -o ntt_avx2.so ntt_avx2.c
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ntt_avx2.so")
+    if np is None or not os.path.exists(path):
+        return None
+    kernel = ctypes.CDLL(path).ntt_stage_int32
+    kernel.argtypes = [np.ctypeslib.ndpointer(np.int32, ndim=1, flags="C_CONTIGUOUS"),
+                       ctypes.c_size_t, ctypes.c_size_t, ctypes.c_int32]
+    kernel.restype = None
+
+    def ntt_stage_avx2(buf, stage, w):
+        kernel(buf, buf.shape[0], stage, int(w))
+
+    return ntt_stage_avx2
+
+# 사용할 stage 커널: AVX2 (ntt_avx2.so) > Numba JIT (NTT_NUMBA=1) > NumPy 벡터화 > SWAR 순서로 선택합니다.
+# ntt_stage_pair 는 두 stage 를 한 번에 계산하는 커널이며, 없으면 stage 마다 ntt_stage 를 씁니다.
+ntt_stage = load_avx2_stage()
+ntt_stage_pair = None
+if np is None:
+    ntt_stage = ntt_stage_swar
+elif ntt_stage is None:
+    if njit is not None:
+        ntt_stage = njit(cache=True, boundscheck=False)(ntt_stage_scalar)
+        ntt_stage_pair = njit(cache=True, boundscheck=False)(ntt_stage_pair_scalar)
+    else:
+        ntt_stage = ntt_stage_numpy
+        ntt_stage_pair = ntt_stage_pair_numpy
+
+# 캐시 블록 크기 (int32 4096 개 = 16KB, L1 에 들어가는 크기)
+TILE_SIZE = 4096
+
+def ntt_stages(buf, stages, w):
+    """
+    모든 stage 를 TILE_SIZE 크기의 블록 단위로 계산합니다.
+    stage 의 버터플라이는 2 * stage 크기로 정렬된 구간 안에서만 값을 섞으므로, 블록 크기가
+    2 * (마지막 stage) 의 배수이면 블록끼리 독립입니다. 블록 하나를 L1 에 올린 채 모든 stage 를
+    끝내므로 큰 BUFFER_SIZE 에서도 배열 전체를 stage 수만큼 다시 읽지 않습니다.
+    ntt_stage_pair 가 있으면 연속한 두 stage 를 한 번에 계산합니다 (stage 수가 홀수이면
+    마지막 stage 만 따로 계산).
+    """
+    paired = len(stages) // 2 * 2 if ntt_stage_pair is not None else 0
+    # array 는 슬라이스가 복사본이므로 NumPy 가 없으면 버퍼 전체를 한 블록으로 계산합니다.
+    tile = max(TILE_SIZE, 2 * stages[-1]) if np is not None else len(buf)
+    for start in range(0, len(buf), tile):
+        block = buf if tile >= len(buf) else buf[start:start + tile]
+        for i in range(0, paired, 2):
+            ntt_stage_pair(block, stages[i], w)
+        for stage in stages[paired:]:
+            ntt_stage(block, stage, w)
+
 # --- 1. 상수 정의 ---
-BUFFER_SIZE = 256
+# C 코드의 BUFFER_SIZE 와 같게 지정합니다 (기본값 256, 예: python3 NTT_basic.py 1024).
+BUFFER_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+if BUFFER_SIZE < 2 or BUFFER_SIZE & (BUFFER_SIZE - 1):
+    sys.exit(f"BUFFER_SIZE must be a power of two >= 2, got {BUFFER_SIZE}")
 
 # --- 2. 메모리 초기화 ---
 # C 코드의 init_point_array + mram_read 와 동일합니다.
-# 1부터 256까지 채워진 int32 배열을 생성합니다.
-read_cache = np.array(range(1, BUFFER_SIZE + 1), dtype=np.int32)
+# 1부터 BUFFER_SIZE 까지 채워진 int32 배열을 생성합니다.
+if np is not None:
+    read_cache = np.arange(1, BUFFER_SIZE + 1, dtype=np.int32)
+else:
+    read_cache = array.array("i", range(1, BUFFER_SIZE + 1))
 
 print("--- 초기 상태 (init_point_array + mram_read 완료) ---")
 # C 코드의 첫 번째 printf 루프와 비교 (C 코드는 %u, 여기서는 %d로 출력)
-for i in range(BUFFER_SIZE):
-    if i < 8 or i > BUFFER_SIZE - 9: # 너무 길어 앞/뒤만 출력
-        print(f"read_cache[{i:3}] = {read_cache[i]}")
+# 줄마다 print 하지 않고 한 번에 출력합니다.
+values = read_cache.tolist()
+sys.stdout.write("".join(f"read_cache[{i:3}] = {values[i]}\n"
+                         for i in range(BUFFER_SIZE)
+                         if i < 8 or i > BUFFER_SIZE - 9)) # 너무 길어 앞/뒤만 출력
 print("... (중략) ...\n")
 
 
 # --- 3. Stage 루프 실행 (C 코드의 main 루프) ---
+# C 코드의 루프 조건: stage * stage < BUFFER_SIZE
+# BUFFER_SIZE = 256 이면 stage는 1, 2, 4, 8 이 됩니다.
+stages = []
 stage = 1
-# C 코드의 루프 조건: stage * stage < BUFFER_SIZE (stage < 16)
-# stage는 1, 2, 4, 8 이 됩니다.
 while stage * stage < BUFFER_SIZE:
     print(f"--- Stage {stage} 처리 중 ---")
-    
-    # 트위들 팩터 (C 코드에서 1로 고정됨)
-    w = np.int32(1)
-    
-    # C 코드의 내부 루프 (0 ~ 127)
-    for i in range(BUFFER_SIZE // 2):
-        
-        # C 코드의 인덱싱 로직
-        index = (i // stage) * (2 * stage) + (i % stage)
-        top = index
-        bottom = index + stage
-        
-        # C 코드의 버터플라이 연산
-        p = read_cache[top]
-        q = read_cache[bottom]
-        
-        result_p, result_q = butterfly(p, q, w)
-        
-        # C 코드와 동일하게 "in-place" (원본 배열)에 덮어씁니다.
-        read_cache[top] = result_p
-        read_cache[bottom] = result_q
-            
+    stages.append(stage)
     # 다음 스테이지로
     stage = stage << 1
 
+# 트위들 팩터 (C 코드에서 1로 고정됨)
+# 이 시뮬레이션은 MOD 나머지 연산을 하지 않으므로 (int32 오버플로우만 흉내 냄) Montgomery 형식
+# 트위들로 줄일 나머지 연산이 없습니다. w == 1 이면 버터플라이가 곱셈도 생략합니다.
+w = 1
+
+# C 코드의 내부 루프 (0 ~ BUFFER_SIZE / 2 - 1) 를 모든 stage 에 대해 실행
+# C 코드는 비트 반전(bit-reversal) 순열을 하지 않으므로 여기서도 하지 않습니다 (결과 순서가 달라짐).
+# (i // stage) * (2 * stage) + (i % stage) 주소는 stage 개씩 연속한 구간이라
+# ntt_stage_numpy 의 reshape view 와 TILE_SIZE 블록으로 이미 순차 접근이 됩니다.
+ntt_stages(read_cache, stages, w)
+
 # --- 4. 최종 결과 출력 ---
 print("\n--- 최종 결과 (모든 Stage 완료) ---")
 print("이 결과가 C 코드의 Tasklet 0번이 마지막에 출력하는 '------Result-------'와 일치해야 합니다.")
-for i in range(BUFFER_SIZE):
-    # C 코드의 최종 printf(%d)와 비교
-    print(f"result[{i:3}] = {read_cache[i]}")
\ No newline at end of file
+# C 코드의 최종 printf(%d)와 비교 (256 번의 print 대신 한 번에 출력)
+sys.stdout.write("".join(f"result[{i:3}] = {v}\n" for i, v in enumerate(read_cache.tolist())))
\ No newline at end of file
@@ -0,0 +1,73 @@
+// AVX2 kernel for one NTT stage of NTT_basic.py (host side, not a DPU program).
+// Build: gcc -O3 -shared -fPIC -o ntt_avx2.so ntt_avx2.c
+//
+// Same butterfly as NTT.c without the modular reduction: int32 arithmetic wraps around
+// like in the Python simulation (computed on uint32_t to avoid signed overflow).
+
+#include <stddef.h>
+#include <stdint.h>
+#include <immintrin.h>
+
+static void ntt_stage_scalar(int32_t *buf, size_t n, size_t stage, int32_t w) {
+    for (size_t i = 0; i < n / 2; i++) {
+        size_t top = (i / stage) * (2 * stage) + (i % stage);
+        size_t bottom = top + stage;
+        uint32_t p = (uint32_t)buf[top];
+        uint32_t prod = (uint32_t)buf[bottom] * (uint32_t)w;
+        buf[top] = (int32_t)(p + prod);
+        buf[bottom] = (int32_t)(p - prod);
+    }
+}
+
+// For stage < 8, a butterfly block (2 * stage elements) fits in one register:
+// broadcast the top and bottom halves of each block, then keep the sums in the top lanes
+// and the differences in the bottom lanes.
+#define SMALL_STAGE_LOOP(TOP, BOTTOM, BLEND_MASK)                               \
+    for (size_t i = 0; i < n; i += 8) {                                         \
+        __m256i v = _mm256_loadu_si256((__m256i *)&buf[i]);                     \
+        __m256i t = (TOP);                                                      \
+        __m256i prod = _mm256_mullo_epi32((BOTTOM), wvec);                      \
+        __m256i r = _mm256_blend_epi32(_mm256_add_epi32(t, prod),               \
+                                       _mm256_sub_epi32(t, prod), BLEND_MASK);  \
+        _mm256_storeu_si256((__m256i *)&buf[i], r);                             \
+    }
+
+__attribute__((target("avx2")))
+static void ntt_stage_avx2(int32_t *buf, size_t n, size_t stage, int32_t w) {
+    __m256i wvec = _mm256_set1_epi32(w);
+
+    switch (stage) {
+    case 1: // [t0 b0 t1 b1 ...]
+        SMALL_STAGE_LOOP(_mm256_shuffle_epi32(v, 0xA0), _mm256_shuffle_epi32(v, 0xF5), 0xAA);
+        return;
+    case 2: // [t0 t1 b0 b1 ...]
+        SMALL_STAGE_LOOP(_mm256_shuffle_epi32(v, 0x44), _mm256_shuffle_epi32(v, 0xEE), 0xCC);
+        return;
+    case 4: // [t0 t1 t2 t3 b0 b1 b2 b3]
+        SMALL_STAGE_LOOP(_mm256_permute2x128_si256(v, v, 0x00),
+                         _mm256_permute2x128_si256(v, v, 0x11), 0xF0);
+        return;
+    default:
+        break;
+    }
+
+    // stage >= 8: top and bottom halves of a block are contiguous runs of whole registers.
+    for (size_t block = 0; block < n; block += 2 * stage) {
+        for (size_t j = block; j < block + stage; j += 8) {
+            __m256i t = _mm256_loadu_si256((__m256i *)&buf[j]);
+            __m256i b = _mm256_loadu_si256((__m256i *)&buf[j + stage]);
+            __m256i prod = _mm256_mullo_epi32(b, wvec);
+            _mm256_storeu_si256((__m256i *)&buf[j], _mm256_add_epi32(t, prod));
+            _mm256_storeu_si256((__m256i *)&buf[j + stage], _mm256_sub_epi32(t, prod));
+        }
+    }
+}
+
+// n and stage are powers of two, as in NTT_basic.py.
+void ntt_stage_int32(int32_t *buf, size_t n, size_t stage, int32_t w) {
+    if (n >= 8 && __builtin_cpu_supports("avx2")) {
+        ntt_stage_avx2(buf, n, stage, w);
+    } else {
+        ntt_stage_scalar(buf, n, stage, w);
+    }
+}